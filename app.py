@@ -4,18 +4,31 @@
 # Cloud-ready deployment
 # ============================================================================
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from functools import wraps
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, stream_with_context
+from functools import wraps, lru_cache
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from datetime import datetime, timezone, timedelta
 import os
+import re
 import json
+import logging
+import sqlite3
+import tempfile
+import time
+import threading
+import queue
+import uuid
 import anthropic
+import httpx
 
 # Optional imports
 try:
     from docx import Document
     from docx.shared import Pt, RGBColor, Inches
     from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml.ns import qn
 except ImportError:
     Document = None
 
@@ -30,10 +43,36 @@ try:
 except ImportError:
     cloudinary = None
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows - fall back to in-process locking only
+
 import requests
 import base64
 import io
 
+def json_loads(data):
+    """Parse JSON from bytes/str (orjson when available)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj, indent=False):
+    """Serialize to UTF-8 JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
+# Warnings from request handlers and background jobs - formatting is deferred
+# until a handler actually emits the record
+log = logging.getLogger('trading_journal')
+
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
@@ -58,38 +97,142 @@ USERS_DB_PATH = os.path.join(os.path.dirname(__file__), 'users.json')
 # ============================================================================
 
 import hashlib
+import hmac
+
+# scrypt parameters (n=2^14, r=8, p=1 uses ~16 MB per hash)
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+
+# Successful verifications are remembered briefly so repeat logins skip the KDF
+VERIFY_CACHE_TTL = 300  # seconds
+VERIFY_CACHE_MAX = 1024
+_verify_cache = {}
+_verify_lock = threading.Lock()
+
+# scrypt runs in OpenSSL with the GIL released, so a small thread pool lets
+# concurrent logins hash in parallel while capping KDF memory (~16 MB each)
+_kdf_pool = ThreadPoolExecutor(max_workers=2)
+# A login that can't get a KDF slot in time fails fast instead of tying up
+# the request thread behind a queue of other logins
+KDF_TIMEOUT = 5  # seconds
 
 def hash_password(password):
-    """Simple password hashing"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Salted scrypt password hash, stored as scrypt$n$r$p$salt$hash"""
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+# Checked against when the username doesn't exist, so a login costs the same
+# KDF either way and response times don't reveal which usernames are taken
+_DUMMY_PASSWORD_HASH = f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${'0' * 32}${'0' * 128}"
+
+def check_password(password, password_hash):
+    """Check a password against a stored hash (scrypt or legacy unsalted SHA-256)"""
+    if password_hash.startswith('scrypt$'):
+        try:
+            _, n, r, p, salt, expected = password_hash.split('$')
+            digest = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=int(n), r=int(r), p=int(p))
+        except ValueError:
+            return False
+        return hmac.compare_digest(digest.hex(), expected)
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(legacy, password_hash)
+
+def _verify_cache_key(username, password):
+    return username.lower(), hashlib.sha256(password.encode()).digest()
+
+def _verify_cached(username, password, password_hash):
+    """True if this exact login was verified against password_hash recently"""
+    hit = _verify_cache.get(_verify_cache_key(username, password))
+    return bool(hit) and hit[0] == password_hash and time.monotonic() < hit[1]
+
+def _remember_verified(username, password, password_hash):
+    with _verify_lock:
+        if len(_verify_cache) >= VERIFY_CACHE_MAX:
+            # Drop the oldest entry (dicts keep insertion order)
+            _verify_cache.pop(next(iter(_verify_cache)))
+        _verify_cache[_verify_cache_key(username, password)] = (password_hash, time.monotonic() + VERIFY_CACHE_TTL)
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock for read-modify-write of path, across threads and gunicorn workers"""
+    with _path_locks_guard:
+        thread_lock = _path_locks.setdefault(path, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_file_atomic(path, data):
+    """Write bytes via a temp file + os.replace, so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+# Parsed JSON files keyed by path, reused until the file's mtime changes
+_json_file_cache = {}
+
+def _file_version(path):
+    """Identity of a file's current contents - os.replace swaps the inode, and
+    mtime alone can tie when two workers write within the same tick"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_ino, st.st_size
+
+def load_json_cached(path):
+    """Load a JSON file, re-parsing only when it changes on disk
+
+    The parsed object is shared - treat it as read-only and copy before editing.
+    """
+    version = _file_version(path)
+    hit = _json_file_cache.get(path)
+    if hit and hit[0] == version:
+        return hit[1]
+    with open(path, 'rb') as f:
+        data = json_loads(f.read())
+    _json_file_cache[path] = (version, data)
+    return data
 
 def load_users():
-    """Load users database"""
+    """Load users database (shared cached dict - copy before modifying)"""
     if os.path.exists(USERS_DB_PATH):
         try:
-            with open(USERS_DB_PATH, 'r') as f:
-                return json.load(f)
+            return load_json_cached(USERS_DB_PATH)
         except:
             pass
     return {}
 
 def save_users(users):
-    """Save users database"""
-    with open(USERS_DB_PATH, 'w') as f:
-        json.dump(users, f, indent=2)
+    """Save users database (callers hold file_lock(USERS_DB_PATH))"""
+    write_file_atomic(USERS_DB_PATH, json_dumps(users, indent=True))
+    # Prime the cache so the next load doesn't re-parse what we just wrote
+    _json_file_cache[USERS_DB_PATH] = (_file_version(USERS_DB_PATH), users)
 
 def migrate_legacy_journal(username):
     """Migrate existing journal_entries.json to user-specific journal"""
     legacy_path = os.path.join(os.path.dirname(__file__), 'journal_entries.json')
     if os.path.exists(legacy_path):
         try:
-            with open(legacy_path, 'r') as f:
-                legacy_data = json.load(f)
+            with open(legacy_path, 'rb') as f:
+                legacy_data = json_loads(f.read())
             if legacy_data.get('entries'):
                 # Copy to user's journal
-                user_journal_path = get_user_journal_path(username)
-                with open(user_journal_path, 'w') as f:
-                    json.dump(legacy_data, f, indent=2)
+                save_cloud_journal(legacy_data, username)
                 print(f"Migrated {len(legacy_data['entries'])} entries to {username}'s journal")
                 return len(legacy_data['entries'])
         except Exception as e:
@@ -98,15 +241,20 @@ def migrate_legacy_journal(username):
 
 def create_user(username, password):
     """Create a new user"""
-    users = load_users()
-    if username.lower() in users:
-        return False, "Username already exists"
-    users[username.lower()] = {
-        'username': username,
-        'password_hash': hash_password(password),
-        'created': datetime.now().isoformat()
-    }
-    save_users(users)
+    # Start hashing while the username is checked
+    password_hash = _kdf_pool.submit(hash_password, password)
+    with file_lock(USERS_DB_PATH):
+        # Copy, so a failed save leaves the cached table untouched
+        users = dict(load_users())
+        if username.lower() in users:
+            password_hash.cancel()
+            return False, "Username already exists"
+        users[username.lower()] = {
+            'username': username,
+            'password_hash': password_hash.result(timeout=KDF_TIMEOUT),
+            'created': datetime.now().isoformat()
+        }
+        save_users(users)
 
     # If this is the first user, migrate any legacy journal data
     if len(users) == 1:
@@ -120,9 +268,35 @@ def verify_user(username, password):
     """Verify user credentials"""
     users = load_users()
     user = users.get(username.lower())
-    if user and user['password_hash'] == hash_password(password):
+    password_hash = user['password_hash'] if user else _DUMMY_PASSWORD_HASH
+    if user and _verify_cached(username, password, password_hash):
         return True, user['username']
-    return False, None
+    check = _kdf_pool.submit(check_password, password, password_hash)
+    try:
+        valid = check.result(timeout=KDF_TIMEOUT)
+    except FutureTimeoutError:
+        check.cancel()  # Still queued - don't spend the KDF on an abandoned login
+        raise
+    if not valid or not user:
+        return False, None
+
+    # Upgrade legacy SHA-256 hashes on successful login
+    if not password_hash.startswith('scrypt$'):
+        upgrade = _kdf_pool.submit(hash_password, password)
+        try:
+            new_hash = upgrade.result(timeout=KDF_TIMEOUT)
+        except FutureTimeoutError:
+            upgrade.cancel()  # Pool is busy - upgrade on a later login instead
+        else:
+            password_hash = new_hash
+            with file_lock(USERS_DB_PATH):
+                users = dict(load_users())
+                if username.lower() in users:
+                    users[username.lower()] = dict(users[username.lower()], password_hash=password_hash)
+                    save_users(users)
+
+    _remember_verified(username, password, password_hash)
+    return True, user['username']
 
 def get_current_user():
     """Get current logged-in username"""
@@ -191,12 +365,25 @@ If market data is provided, incorporate relevant observations into the Market Co
 # Helper Functions
 # ============================================================================
 
+_EST = timezone(timedelta(hours=-5))
+
 def get_est_timestamp():
-    est = timezone(timedelta(hours=-5))
-    return datetime.now(est).strftime('%A, %B %d, %Y %I:%M %p EST')
+    return datetime.now(_EST).strftime('%A, %B %d, %Y %I:%M %p EST')
+
+# Environment variables (required for cloud deployment) -> config keys
+CONFIG_ENV_MAPPINGS = {
+    "ANTHROPIC_API_KEY": "api_key",
+    "CLOUDINARY_CLOUD_NAME": "cloudinary_cloud_name",
+    "CLOUDINARY_API_KEY": "cloudinary_api_key",
+    "CLOUDINARY_API_SECRET": "cloudinary_api_secret"
+}
 
 def load_config():
-    """Load all config settings - environment variables take priority"""
+    """Load all config settings - environment variables take priority
+
+    The file is only re-parsed when it changes on disk (load_json_cached), so
+    edits by hand or by another worker are picked up on the next call.
+    """
     config = {
         "api_key": "",
         "cloudinary_cloud_name": "",
@@ -204,15 +391,7 @@ def load_config():
         "cloudinary_api_secret": ""
     }
 
-    # Environment variables (required for cloud deployment)
-    env_mappings = {
-        "ANTHROPIC_API_KEY": "api_key",
-        "CLOUDINARY_CLOUD_NAME": "cloudinary_cloud_name",
-        "CLOUDINARY_API_KEY": "cloudinary_api_key",
-        "CLOUDINARY_API_SECRET": "cloudinary_api_secret"
-    }
-
-    for env_var, config_key in env_mappings.items():
+    for env_var, config_key in CONFIG_ENV_MAPPINGS.items():
         env_val = os.environ.get(env_var)
         if env_val:
             config[config_key] = env_val
@@ -220,12 +399,11 @@ def load_config():
     # Load from config file (local mode only, won't override env vars)
     if not IS_CLOUD and os.path.exists(CONFIG_PATH):
         try:
-            with open(CONFIG_PATH) as f:
-                data = json.load(f)
-                # Only use file values if env vars are not set
-                for key, val in data.items():
-                    if not config.get(key):
-                        config[key] = val
+            data = load_json_cached(CONFIG_PATH)
+            # Only use file values if env vars are not set
+            for key, val in data.items():
+                if not config.get(key):
+                    config[key] = val
         except:
             pass
 
@@ -239,10 +417,10 @@ def save_config(config):
         return True
 
     try:
-        existing = load_config()
-        existing.update(config)
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(existing, f)
+        with file_lock(CONFIG_PATH):
+            existing = dict(load_config())
+            existing.update(config)
+            write_file_atomic(CONFIG_PATH, json_dumps(existing))
         return True
     except:
         return False
@@ -272,100 +450,415 @@ def configure_cloudinary():
     return False
 
 # ============================================================================
-# Cloud Journal Storage (JSON-based, user-specific)
+# Cloud Journal Storage (SQLite, user-specific)
 # ============================================================================
 
-def get_user_journal_path(username=None):
-    """Get the journal path for a specific user"""
+# One database for all users; entries are ordered by insertion id, which is
+# what the index-based delete/update API and "most recent first" listing use
+JOURNAL_DB_PATH = os.environ.get('JOURNAL_DB_PATH', os.path.join(os.path.dirname(__file__), 'journal.db'))
+
+_db_local = threading.local()
+_migrated_users = set()
+_migrate_lock = threading.Lock()
+
+def get_db():
+    """Per-thread SQLite connection (WAL mode allows concurrent readers)"""
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(JOURNAL_DB_PATH, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user TEXT NOT NULL,
+            ts TEXT,
+            body BLOB NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_user_id ON entries(user, id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS migrated_files (name TEXT PRIMARY KEY)")
+        conn.commit()
+        _db_local.conn = conn
+    return conn
+
+_USERNAME_STRIP = re.compile(r'[^\w-]+')
+
+@lru_cache(maxsize=256)
+def safe_username(username):
+    """Sanitize username for use in a filename / journal key"""
+    return _USERNAME_STRIP.sub('', username).lower() or "default"
+
+def journal_user(username=None):
+    """Journal key for a user, importing any old file-based journal first"""
+    if username is None:
+        username = get_current_user()
+    user = safe_username(username)
+    if user not in _migrated_users:
+        with _migrate_lock:
+            if user not in _migrated_users:
+                migrate_file_journal(username)
+                _migrated_users.add(user)
+    return user
+
+def get_user_journal_path(username=None, ext='ndjson'):
+    """Path of a user's old file-based journal (journal_<user>.ndjson / .json)"""
     if username is None:
         username = get_current_user()
-    # Sanitize username for filename
-    safe_username = "".join(c for c in username if c.isalnum() or c in '-_').lower()
-    if not safe_username:
-        safe_username = "default"
-    return os.path.join(os.path.dirname(__file__), f'journal_{safe_username}.json')
+    return os.path.join(os.path.dirname(__file__), f'journal_{safe_username(username)}.{ext}')
+
+def migrate_file_journal(username):
+    """Import journal_<user>.json / .ndjson into SQLite (one-time, files kept as .bak)"""
+    for ext in ('json', 'ndjson'):
+        path = get_user_journal_path(username, ext=ext)
+        if not os.path.exists(path):
+            continue
+        name = os.path.basename(path)
+        try:
+            with open(path, 'rb') as f:
+                if ext == 'json':
+                    entries = json_loads(f.read()).get('entries', [])
+                else:
+                    entries = [json_loads(line) for line in f if line.strip()]
+            conn = get_db()
+            try:
+                # The file is recorded in the same transaction as its entries, so
+                # it is imported once even if two workers race or the process
+                # dies before the rename below
+                with conn:
+                    conn.execute("INSERT INTO migrated_files (name) VALUES (?)", (name,))
+                    conn.executemany("INSERT INTO entries (user, ts, body) VALUES (?, ?, ?)",
+                                     [(safe_username(username), e.get('timestamp', ''), json_dumps(e)) for e in entries])
+                print(f"Migrated {len(entries)} entries from {name}")
+            except sqlite3.IntegrityError:
+                pass  # Already imported - just finish the rename
+            os.replace(path, path + '.bak')
+        except FileNotFoundError:
+            pass  # Another worker renamed it first
+        except Exception as e:
+            print(f"Journal migration error: {e}")
 
 def load_cloud_journal(username=None):
-    """Load journal entries from JSON file (cloud mode, user-specific)"""
-    journal_path = get_user_journal_path(username)
-    if os.path.exists(journal_path):
-        try:
-            with open(journal_path, 'r') as f:
-                return json.load(f)
-        except:
-            return {"entries": []}
-    return {"entries": []}
+    """Load all journal entries for a user, oldest first"""
+    rows = get_db().execute("SELECT body FROM entries WHERE user = ? ORDER BY id",
+                            (journal_user(username),))
+    return {"entries": [json_loads(body) for (body,) in rows]}
+
+def cloud_entry_rows(username=None):
+    """(row id, entry) pairs for a user's journal, oldest first"""
+    rows = get_db().execute("SELECT id, body FROM entries WHERE user = ? ORDER BY id",
+                            (journal_user(username),))
+    return [(row_id, json_loads(body)) for row_id, body in rows]
+
+def recent_cloud_entries(limit, username=None):
+    """Most recent entries first - an index seek, no full journal load"""
+    rows = get_db().execute("SELECT body FROM entries WHERE user = ? ORDER BY id DESC LIMIT ?",
+                            (journal_user(username), limit))
+    return [json_loads(body) for (body,) in rows]
 
 def save_cloud_journal(data, username=None):
-    """Save journal entries to JSON file (cloud mode, user-specific)"""
-    journal_path = get_user_journal_path(username)
+    """Replace a user's whole journal (used for clears and bulk rewrites)"""
+    user = journal_user(username)
+    try:
+        conn = get_db()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE user = ?", (user,))
+            conn.executemany("INSERT INTO entries (user, ts, body) VALUES (?, ?, ?)",
+                             [(user, e.get('timestamp', ''), json_dumps(e)) for e in data.get('entries', [])])
+        return True
+    except Exception as e:
+        log.warning("Error saving cloud journal: %s", e)
+        return False
+
+def add_cloud_entries(entries, username=None):
+    """Append entries to the cloud journal in a single transaction (one commit)"""
+    user = journal_user(username)
     try:
-        with open(journal_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        conn = get_db()
+        with conn:
+            conn.executemany("INSERT INTO entries (user, ts, body) VALUES (?, ?, ?)",
+                             [(user, e.get('timestamp', ''), json_dumps(e)) for e in entries])
         return True
     except Exception as e:
-        print(f"Error saving cloud journal: {e}")
+        log.warning("Error saving cloud journal: %s", e)
         return False
 
-def add_cloud_entry(entry, username=None):
-    """Add a new entry to the cloud journal"""
-    journal = load_cloud_journal(username)
-    journal["entries"].append(entry)
-    return save_cloud_journal(journal, username)
+def _cloud_entry_row(conn, user, index):
+    """(id, entry) of the index-th entry (negative counts from the end), or None"""
+    if index < 0:
+        order, index = "DESC", -index - 1
+    else:
+        order = "ASC"
+    row = conn.execute(f"SELECT id, body FROM entries WHERE user = ? ORDER BY id {order} LIMIT 1 OFFSET ?",
+                       (user, index)).fetchone()
+    return (row[0], json_loads(row[1])) if row else None
+
+def update_cloud_entry(index, changes, username=None):
+    """Merge changes into the entry at a position in the journal; False if it doesn't exist"""
+    user = journal_user(username)
+    conn = get_db()
+    with conn:
+        # Take the write lock before reading, so a concurrent write can't land
+        # between the SELECT and the UPDATE
+        conn.execute("BEGIN IMMEDIATE")
+        row = _cloud_entry_row(conn, user, index)
+        if row is None:
+            return False
+        entry = row[1]
+        entry.update(changes)
+        conn.execute("UPDATE entries SET ts = ?, body = ? WHERE id = ?",
+                     (entry.get('timestamp', ''), json_dumps(entry), row[0]))
+    return True
+
+def update_cloud_entries(row_ids, apply, username=None):
+    """Replace each listed entry with apply(row_id, entry) in one transaction
+
+    Rows are matched by primary key and re-read under the write lock, so
+    apply sees the latest version and other entries are left untouched.
+    """
+    user = journal_user(username)
+    conn = get_db()
+    updated = 0
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for row_id in row_ids:
+            row = conn.execute("SELECT body FROM entries WHERE id = ? AND user = ?", (row_id, user)).fetchone()
+            if row is None:
+                continue  # Deleted since it was read
+            entry = apply(row_id, json_loads(row[0]))
+            conn.execute("UPDATE entries SET ts = ?, body = ? WHERE id = ?",
+                         (entry.get('timestamp', ''), json_dumps(entry), row_id))
+            updated += 1
+    return updated
+
+def delete_cloud_entry(index, username=None):
+    """Delete the entry at a position in the journal, returning it (or None)"""
+    user = journal_user(username)
+    conn = get_db()
+    with conn:
+        # Locked before the lookup, so two deletes can't resolve to the same row
+        conn.execute("BEGIN IMMEDIATE")
+        row = _cloud_entry_row(conn, user, index)
+        if row is None:
+            return None
+        conn.execute("DELETE FROM entries WHERE id = ?", (row[0],))
+    return row[1]
+
+# ============================================================================
+# Local Journal Storage (Word document)
+# ============================================================================
+
+# Parsed journal index, reused until the .docx changes on disk
+_docx_cache = {'key': None, 'journal': None}
+_docx_lock = threading.Lock()
+
+# Markers written by api_save_journal - a separator line is a run of '═'
+_SEP_CHAR = '═'
+_ENTRY_HEADER = 'TRADING JOURNAL ENTRY'
+_DAY_RE = re.compile(r'(?:Mon|Tues|Wednes|Thurs|Fri|Satur|Sun)day')
+
+def load_docx_journal(path):
+    """Parsed Word journal: {'entries': [...oldest first], 'content': full text}"""
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _docx_lock:
+        if _docx_cache['key'] == key:
+            return _docx_cache['journal']
+        journal = _parse_journal(path)
+        _docx_cache['key'] = key
+        _docx_cache['journal'] = journal
+        return journal
+
+def invalidate_docx_journal():
+    with _docx_lock:
+        _docx_cache['key'] = None
+
+def _preview(lines, limit=100):
+    """First `limit` chars of an entry's text lines joined by spaces, plus '...'"""
+    out = []
+    n = 0
+    for l in lines:
+        if not l or l[0] == _SEP_CHAR or l == _ENTRY_HEADER or 'Market Sentiment' in l:
+            continue
+        if out:
+            out.append(' ')
+            n += 1
+        out.append(l)
+        n += len(l)
+        # Later lines can't reach the preview
+        if n >= limit:
+            break
+    return ''.join(out)[:limit] + '...' if out else ''
+
+def _parse_journal(path):
+    """Split the Word journal into entries - each entry starts with the separator line"""
+    doc = Document(path)
+    paragraphs = []
+    entries = []
+    current_entry = []
+    entry_timestamp = None
+    entry_sentiment = None
+
+    # Walk the body's <w:p> elements directly (same set as doc.paragraphs)
+    # and rebuild their text the way para.text does - avoids building
+    # Paragraph/Run wrappers for every line
+    W_P, W_R, W_HYPERLINK = qn('w:p'), qn('w:r'), qn('w:hyperlink')
+    W_T, W_BR, W_TYPE = qn('w:t'), qn('w:br'), qn('w:type')
+    run_chars = {qn('w:tab'): '\t', qn('w:ptab'): '\t', qn('w:cr'): '\n', qn('w:noBreakHyphen'): '-'}
+
+    def para_text(p):
+        parts = []
+        for child in p.iterchildren(W_R, W_HYPERLINK):
+            for run in (child,) if child.tag == W_R else child.iterchildren(W_R):
+                for e in run.iterchildren():
+                    if e.tag == W_T:
+                        parts.append(e.text or '')
+                    elif e.tag == W_BR:
+                        # Page and column breaks carry no text
+                        if e.get(W_TYPE) in (None, 'textWrapping'):
+                            parts.append('\n')
+                    elif e.tag in run_chars:
+                        parts.append(run_chars[e.tag])
+        return ''.join(parts)
+
+    for p in doc.element.body.iterchildren(W_P):
+        text = para_text(p).strip()
+        if text:
+            paragraphs.append(text)
+
+        # Detect entry separator
+        if text and (text[0] == _SEP_CHAR or text == _ENTRY_HEADER):
+            if current_entry and entry_timestamp:
+                # Save previous entry
+                content = '\n'.join(current_entry)
+                # Get preview (first 100 chars of actual content)
+                preview = _preview(current_entry)
+
+                entries.append({
+                    'timestamp': entry_timestamp,
+                    'sentiment': entry_sentiment,
+                    'preview': preview,
+                    'content': content
+                })
+
+            if text == _ENTRY_HEADER:
+                current_entry = [text]
+                entry_timestamp = None
+                entry_sentiment = None
+            else:
+                current_entry = [text]
+        elif current_entry is not None:
+            current_entry.append(text)
+
+            # Try to extract timestamp (usually line after TRADING JOURNAL ENTRY)
+            if entry_timestamp is None and text and text[0] != _SEP_CHAR and 'Market Sentiment' not in text:
+                # Check if it looks like a date
+                if _DAY_RE.search(text):
+                    entry_timestamp = text
+
+            # Extract sentiment
+            if 'Market Sentiment:' in text:
+                entry_sentiment = text.replace('Market Sentiment:', '').strip()
+
+    # Don't forget the last entry
+    if current_entry and entry_timestamp:
+        content = '\n'.join(current_entry)
+        preview = _preview(current_entry)
+
+        entries.append({
+            'timestamp': entry_timestamp,
+            'sentiment': entry_sentiment,
+            'preview': preview,
+            'content': content
+        })
+
+    return {'entries': entries, 'content': '\n'.join(paragraphs)}
+
+# ============================================================================
+# Market Data
+# ============================================================================
+
+# Market data cache - Yahoo quotes only move every few seconds, so a short TTL
+# collapses bursts of page loads / entry processing into a single fetch
+MARKET_CACHE_TTL = 45  # seconds
+# 'prompt' holds (data, formatted text) for the cached snapshot
+_market_cache = {'data': None, 'expires': 0.0, 'prompt': None}
+_market_lock = threading.Lock()
 
 def get_market_data():
+    """Return market data, served from cache while it is fresh"""
+    if time.monotonic() < _market_cache['expires']:
+        return _market_cache['data']
+
+    # Only one thread refreshes; concurrent callers wait and reuse its result
+    with _market_lock:
+        if time.monotonic() < _market_cache['expires']:
+            return _market_cache['data']
+        data = fetch_market_data()
+        if data:
+            _market_cache['prompt'] = (data, format_market_for_prompt(data))
+            _market_cache['data'] = data
+            _market_cache['expires'] = time.monotonic() + MARKET_CACHE_TTL
+        return data
+
+MARKET_SYMBOLS = {
+    '^GSPC': 'SPX',
+    '^NDX': 'NDX',
+    '^RUT': 'RUT',
+    '^DJI': 'DJI',
+    'GLD': 'Gold',
+    'BTC-USD': 'Bitcoin',
+    'TLT': 'TLT',
+}
+
+def _fetch_ticker(sym, name):
+    """Fetch close-to-close change for one ticker, returns (sym, dict) or None"""
+    try:
+        t = yf.Ticker(sym)
+        # Use 5 day history with daily interval for reliable close-to-close data
+        hist = t.history(period='5d', interval='1d')
+        closes = hist['Close'].to_numpy()
+        if len(closes) >= 2:
+            # Today's close (or most recent) and previous day's close
+            curr, prev_close = float(closes[-1]), float(closes[-2])
+            ch = (curr / prev_close - 1.0) * 100.0
+            return sym, {
+                'name': name,
+                'price': round(curr, 2),
+                'change': round(ch, 2),
+                'direction': 'up' if ch > 0 else 'down' if ch < 0 else 'flat'
+            }
+    except:
+        pass
+    return None
+
+def _fetch_vix():
+    """Fetch VIX level and change, returns ('VIX', dict) or None"""
+    # Same daily history as the other tickers - previous close is closes[-2],
+    # so no separate t.info request is needed
+    result = _fetch_ticker('^VIX', 'VIX')
+    if result is None:
+        return None
+    quote = result[1]
+    curr = quote['price']
+    quote['status'] = 'LOW' if curr < 15 else 'ELEVATED' if curr > 25 else 'NORMAL'
+    return 'VIX', quote
+
+def fetch_market_data():
+    """Fetch fresh market data from Yahoo Finance"""
     if yf is None:
         return None
 
     try:
         data = {}
-        symbols = {
-            '^GSPC': 'SPX',
-            '^NDX': 'NDX',
-            '^RUT': 'RUT',
-            '^DJI': 'DJI',
-            'GLD': 'Gold',
-            'BTC-USD': 'Bitcoin',
-            'TLT': 'TLT',
-        }
 
-        for sym, name in symbols.items():
-            try:
-                t = yf.Ticker(sym)
-                # Use 5 day history with daily interval for reliable close-to-close data
-                hist = t.history(period='5d', interval='1d')
-                if len(hist) >= 2:
-                    # Today's close (or most recent)
-                    curr = float(hist['Close'].iloc[-1])
-                    # Previous day's close
-                    prev_close = float(hist['Close'].iloc[-2])
-                    ch = ((curr - prev_close) / prev_close) * 100
-                    data[sym] = {
-                        'name': name,
-                        'price': round(curr, 2),
-                        'change': round(ch, 2),
-                        'direction': 'up' if ch > 0 else 'down' if ch < 0 else 'flat'
-                    }
-            except:
-                pass
-
-        # VIX
-        try:
-            t = yf.Ticker('^VIX')
-            hist = t.history(period='1d', interval='1m')
-            if len(hist):
-                curr = float(hist['Close'].iloc[-1])
-                prev = t.info.get("previousClose", curr)
-                ch = ((curr - prev) / prev) * 100 if prev else 0
-                data['VIX'] = {
-                    'name': 'VIX',
-                    'price': round(curr, 2),
-                    'change': round(ch, 2),
-                    'direction': 'up' if ch > 0 else 'down' if ch < 0 else 'flat',
-                    'status': 'LOW' if curr < 15 else 'ELEVATED' if curr > 25 else 'NORMAL'
-                }
-        except:
-            pass
+        # Each ticker is a blocking HTTP round-trip - run them concurrently
+        with ThreadPoolExecutor(max_workers=len(MARKET_SYMBOLS) + 1) as executor:
+            futures = [executor.submit(_fetch_ticker, sym, name) for sym, name in MARKET_SYMBOLS.items()]
+            futures.append(executor.submit(_fetch_vix))
+            for future in as_completed(futures):
+                result = future.result()
+                if result:
+                    sym, quote = result
+                    data[sym] = quote
 
         # Calculate sentiment based on SPX
         spy_ch = data.get('^GSPC', {}).get('change', 0)
@@ -393,17 +886,22 @@ def get_market_data():
             sentiment = {'label': 'NEUTRAL', 'color': 'yellow', 'icon': '🟡'}
 
         data['sentiment'] = sentiment
-        data['timestamp'] = datetime.now(timezone(timedelta(hours=-5))).strftime('%I:%M:%S %p EST')
+        data['timestamp'] = datetime.now(_EST).strftime('%I:%M:%S %p EST')
 
         return data
     except Exception as e:
-        print(f"Market data error: {e}")
+        log.warning("Market data error: %s", e)
         return None
 
 def format_market_for_prompt(data):
     if not data:
         return ""
 
+    # The cached snapshot's text is built once when it is fetched
+    cached = _market_cache['prompt']
+    if cached and cached[0] is data:
+        return cached[1]
+
     lines = ["Current Market Conditions:"]
     for sym in ['^GSPC', '^NDX', '^RUT', '^DJI', 'GLD', 'BTC-USD', 'TLT', 'VIX']:
         if sym in data:
@@ -422,6 +920,289 @@ def format_market_for_prompt(data):
     return '\n'.join(lines)
 
 
+# ============================================================================
+# Claude API calls - rate limiting and retries
+# ============================================================================
+
+# Token bucket shared by all requests in this process
+CLAUDE_REQUESTS_PER_MINUTE = 60
+# Backoff between attempts on 429 / 5xx / connection errors (kept short - a
+# user is waiting on the other end of the request)
+CLAUDE_RETRY_DELAYS = (2, 5, 15)
+_claude_bucket = {'tokens': float(CLAUDE_REQUESTS_PER_MINUTE), 'updated': time.monotonic()}
+_claude_bucket_lock = threading.Lock()
+
+# One client per API key - it owns the httpx connection pool, so reusing it
+# keeps the TLS connection to api.anthropic.com warm between requests
+_anthropic_clients = {}  # api_key -> anthropic.Anthropic
+_anthropic_lock = threading.Lock()
+
+def get_anthropic_client(api_key):
+    """Shared Anthropic client for this API key"""
+    client = _anthropic_clients.get(api_key)
+    if client is None:
+        with _anthropic_lock:
+            client = _anthropic_clients.get(api_key)
+            if client is None:
+                # Retries are handled by stream_claude_text
+                client = _anthropic_clients[api_key] = anthropic.Anthropic(api_key=api_key, max_retries=0)
+    return client
+
+def acquire_claude_slot():
+    """Block until the token bucket allows another Claude request"""
+    while True:
+        with _claude_bucket_lock:
+            now = time.monotonic()
+            refill = (now - _claude_bucket['updated']) * CLAUDE_REQUESTS_PER_MINUTE / 60
+            _claude_bucket['tokens'] = min(float(CLAUDE_REQUESTS_PER_MINUTE), _claude_bucket['tokens'] + refill)
+            _claude_bucket['updated'] = now
+            if _claude_bucket['tokens'] >= 1:
+                _claude_bucket['tokens'] -= 1
+                return
+            wait = (1 - _claude_bucket['tokens']) * 60 / CLAUDE_REQUESTS_PER_MINUTE
+        time.sleep(wait)
+
+def is_retryable_claude_error(e):
+    """Rate limits, overloads, server errors and dropped connections are transient"""
+    if isinstance(e, (anthropic.RateLimitError, anthropic.APIConnectionError)):
+        return True
+    return isinstance(e, anthropic.APIStatusError) and e.status_code >= 500
+
+def claude_retry_delay(e, attempt):
+    """Backoff for this attempt, honouring a short Retry-After from the API"""
+    delay = CLAUDE_RETRY_DELAYS[attempt]
+    response = getattr(e, 'response', None)
+    try:
+        retry_after = float(response.headers.get('retry-after'))
+        return min(max(retry_after, delay), CLAUDE_RETRY_DELAYS[-1])
+    except (AttributeError, TypeError, ValueError):
+        return delay
+
+CLAUDE_MODEL = "claude-sonnet-4-20250514"
+CLAUDE_MAX_TOKENS = 2000
+
+# Dead-man timer for streams: the API sends ping events while generating, so
+# this long without any bytes means the connection has hung
+CLAUDE_STALL_TIMEOUT = 30  # seconds
+CLAUDE_STREAM_TIMEOUT = httpx.Timeout(600, connect=10, read=CLAUDE_STALL_TIMEOUT)
+
+def build_entry_message(market_text, timestamp, raw_text):
+    """User-turn content blocks for one entry
+
+    The market snapshot goes first: it is byte-identical for every entry within
+    the market cache TTL, so it extends the cached prompt prefix; the
+    per-minute timestamp and the notes come after it.
+    """
+    msg = []
+    if market_text:
+        msg.append({"type": "text", "text": market_text, "cache_control": {"type": "ephemeral"}})
+    msg.append({"type": "text", "text": f"Date/Time: {timestamp}\n\nMy trading thoughts:\n{raw_text}"})
+    return msg
+
+def build_claude_request(msg):
+    """messages.create / stream / batch params for one journal entry prompt
+
+    msg is the user turn - a string or a list of content blocks.
+    """
+    return {
+        'model': CLAUDE_MODEL,
+        'max_tokens': CLAUDE_MAX_TOKENS,
+        # Identical for every user and entry, so mark it for prompt caching
+        # (Anthropic only caches prefixes above the model's minimum length)
+        'system': [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
+        'messages': [{"role": "user", "content": msg}]
+    }
+
+def stream_claude_text(client, **kwargs):
+    """Yield text from messages.stream, retrying transient errors before the first chunk"""
+    for attempt in range(len(CLAUDE_RETRY_DELAYS) + 1):
+        acquire_claude_slot()
+        started = False
+        try:
+            with client.messages.stream(timeout=CLAUDE_STREAM_TIMEOUT, **kwargs) as stream:
+                for text in stream.text_stream:
+                    started = True
+                    yield text
+            return
+        except Exception as e:
+            # Once text has reached the browser a retry would duplicate it
+            if started or attempt == len(CLAUDE_RETRY_DELAYS) or not is_retryable_claude_error(e):
+                raise
+            time.sleep(claude_retry_delay(e, attempt))
+
+
+# ============================================================================
+# Burst coalescing for buffered process-entry calls
+# ============================================================================
+
+# Non-streamed entries that arrive within a short window (same user, API key
+# and market snapshot) are formatted by a single Claude request, saving the
+# per-request round trip and repeated system-prompt input tokens. Grouping is
+# per user so one user's notes never share a prompt with another's.
+ENTRY_BATCH_MAX = 8
+ENTRY_BATCH_WINDOW = 0.25  # seconds
+ENTRY_BATCH_TIMEOUT = 600  # seconds a caller waits for its result
+
+_entry_queue = queue.Queue()
+# Only shared (2+ entry) requests run here - lone entries, and the per-entry
+# fallback for a bad batch reply, are formatted in the caller's own request
+# thread, so concurrency is never capped below the server's thread count
+_entry_batch_pool = ThreadPoolExecutor(max_workers=4)
+# Result telling a caller to make its own single-entry request
+_FORMAT_ALONE = object()
+_entry_batcher = {'thread': None}
+_entry_batcher_lock = threading.Lock()
+
+def format_entry_batched(username, client, market_text, timestamp, raw_text):
+    """Format one entry, sharing a Claude request with concurrent callers"""
+    with _entry_batcher_lock:
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        if _entry_batcher['thread'] is None:
+            _entry_batcher['thread'] = threading.Thread(target=_entry_batch_loop, daemon=True)
+            _entry_batcher['thread'].start()
+    future = Future()
+    _entry_queue.put(((username, id(client), market_text), client, market_text, timestamp, raw_text, future))
+    result = future.result(timeout=ENTRY_BATCH_TIMEOUT)
+    if result is _FORMAT_ALONE:
+        msg = build_entry_message(market_text, timestamp, raw_text)
+        result = ''.join(stream_claude_text(client, **build_claude_request(msg)))
+    return result
+
+def _entry_batch_loop():
+    while True:
+        batch = [_entry_queue.get()]
+        deadline = time.monotonic() + ENTRY_BATCH_WINDOW
+        while len(batch) < ENTRY_BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_entry_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        groups = {}
+        for item in batch:
+            groups.setdefault(item[0], []).append(item)
+        for items in groups.values():
+            if len(items) == 1:
+                items[0][5].set_result(_FORMAT_ALONE)
+            else:
+                _entry_batch_pool.submit(_run_entry_group, items)
+
+def _run_entry_group(items):
+    """Format a group of entries in one request, falling back to one call each"""
+    client, market_text = items[0][1], items[0][2]
+    sections = [f"### Entry {i}\nDate/Time: {item[3]}\n\nMy trading thoughts:\n{item[4]}"
+                for i, item in enumerate(items, 1)]
+    instructions = (f"Below are {len(items)} separate sets of trading thoughts. Format each one "
+                    f"independently as its own journal entry. Respond with ONLY a JSON array of "
+                    f"{len(items)} strings, one formatted entry per set, in the same order.\n\n")
+    msg = []
+    if market_text:
+        msg.append({"type": "text", "text": market_text, "cache_control": {"type": "ephemeral"}})
+    msg.append({"type": "text", "text": instructions + "\n\n".join(sections)})
+
+    request_params = build_claude_request(msg)
+    request_params['max_tokens'] = CLAUDE_MAX_TOKENS * len(items)
+    try:
+        text = ''.join(stream_claude_text(client, **request_params))
+        formatted = json.loads(text[text.index('['):text.rindex(']') + 1])
+        if len(formatted) != len(items) or not all(isinstance(f, str) and f for f in formatted):
+            raise ValueError("unexpected batch response shape")
+    except Exception as e:
+        log.warning("Batched entry formatting failed, retrying individually: %s", e)
+        # Each caller retries concurrently in its own thread
+        for item in items:
+            item[5].set_result(_FORMAT_ALONE)
+        return
+
+    for item, content in zip(items, formatted):
+        item[5].set_result(content)
+
+
+# ============================================================================
+# Formatted entry cache
+# ============================================================================
+
+# Resubmitting the same text (e.g. after a network hiccup) reuses the entry
+# Claude just formatted, and a duplicate that arrives while the first call is
+# still running waits for it instead of starting a second one
+ENTRY_CACHE_MAX = 128
+ENTRY_CACHE_TTL = 300  # seconds
+
+_entry_cache = OrderedDict()  # key -> (stored_at, content), oldest first
+_entry_inflight = {}  # key -> (started_at, future) for calls still running
+_entry_cache_lock = threading.Lock()
+
+def entry_cache_key(username, raw_text, market_text, sentiment):
+    """Digest of everything that shapes the formatted entry"""
+    label = (sentiment.get('label') or '') if market_text else '-'
+    parts = (username or '', SYSTEM_PROMPT, label, raw_text)
+    return hashlib.blake2b('\0'.join(parts).encode(), digest_size=16).digest()
+
+def lookup_entry(key):
+    """Return (content, future, owner) for a cache key
+
+    content is set on a hit. Otherwise future resolves to the content - when
+    owner is True the caller must format the entry and call finish_entry.
+    """
+    now = time.monotonic()
+    with _entry_cache_lock:
+        hit = _entry_cache.get(key)
+        if hit and now - hit[0] < ENTRY_CACHE_TTL:
+            _entry_cache.move_to_end(key)
+            return hit[1], None, False
+        pending = _entry_inflight.get(key)
+        # A call that never published its result stops blocking the key
+        if pending and now - pending[0] < ENTRY_BATCH_TIMEOUT:
+            return None, pending[1], False
+        future = Future()
+        _entry_inflight[key] = (now, future)
+        return None, future, True
+
+def finish_entry(key, future, content=None, error=None):
+    """Publish the owner's result to the cache and to any waiting duplicates"""
+    with _entry_cache_lock:
+        if _entry_inflight.get(key, (None, None))[1] is future:
+            del _entry_inflight[key]
+        if error is None:
+            _entry_cache[key] = (time.monotonic(), content)
+            _entry_cache.move_to_end(key)
+            while len(_entry_cache) > ENTRY_CACHE_MAX:
+                _entry_cache.popitem(last=False)
+    if error is None:
+        future.set_result(content)
+    else:
+        future.set_exception(error)
+
+def start_entry_stream(key, future, client, claude_request):
+    """Stream an entry from Claude on a background thread, independent of the browser
+
+    Returns a queue of text chunks ending with None, or with the exception that
+    stopped the stream. The result is always published with finish_entry, so a
+    browser that disconnects mid-stream still leaves the entry cached for the
+    resubmit.
+    """
+    chunks = queue.Queue()
+
+    def run():
+        parts = []
+        try:
+            for text in stream_claude_text(client, **claude_request):
+                parts.append(text)
+                chunks.put(text)
+        except Exception as e:
+            finish_entry(key, future, error=e)
+            chunks.put(e)
+        else:
+            finish_entry(key, future, ''.join(parts))
+            chunks.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    return chunks
+
+
 # ============================================================================
 # Routes
 # ============================================================================
@@ -433,7 +1214,10 @@ def login():
         if is_multi_user_mode():
             username = request.form.get('username', '').strip()
             password = request.form.get('password', '')
-            success, display_name = verify_user(username, password)
+            try:
+                success, display_name = verify_user(username, password)
+            except FutureTimeoutError:
+                return render_template('login.html', error='Server is busy - please try again', multi_user=True)
             if success:
                 session['authenticated'] = True
                 session['username'] = display_name
@@ -442,7 +1226,7 @@ def login():
 
         # Legacy single-user mode
         password = request.form.get('password', '')
-        if password == APP_PASSWORD:
+        if hmac.compare_digest(password.encode(), APP_PASSWORD.encode()):
             session['authenticated'] = True
             session['username'] = 'default'
             return redirect(url_for('index'))
@@ -463,7 +1247,7 @@ def register():
         invite_code = request.form.get('invite_code', '')
 
         # Validate invite code
-        if invite_code != INVITE_CODE:
+        if not hmac.compare_digest(invite_code.encode(), INVITE_CODE.encode()):
             return render_template('register.html', error='Invalid invite code')
 
         # Validate username
@@ -481,7 +1265,10 @@ def register():
             return render_template('register.html', error='Passwords do not match')
 
         # Create user
-        success, message = create_user(username, password)
+        try:
+            success, message = create_user(username, password)
+        except FutureTimeoutError:
+            return render_template('register.html', error='Server is busy - please try again')
         if success:
             # Auto-login after registration
             session['authenticated'] = True
@@ -510,6 +1297,14 @@ def api_market_data():
         return jsonify(data)
     return jsonify({'error': 'Could not fetch market data'}), 500
 
+def sse_event(payload):
+    """Format one server-sent event carrying a JSON payload"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def wants_event_stream():
+    """True if the client asked for a streamed (SSE) response"""
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
 @app.route('/api/process-entry', methods=['POST'])
 @login_required
 def api_process_entry():
@@ -525,44 +1320,218 @@ def api_process_entry():
         if not api_key:
             return jsonify({'error': 'API key not configured'}), 400
 
+        # One market snapshot for both the prompt and the entry's sentiment
+        market_data = get_market_data()
+
         # Build message
         timestamp = get_est_timestamp()
-        msg = f"Date/Time: {timestamp}\n\n"
-
-        if include_market:
-            market_data = get_market_data()
-            if market_data:
-                msg += format_market_for_prompt(market_data) + "\n\n"
-
-        msg += f"My trading thoughts:\n{raw_text}"
-
-        # Call Claude
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2000,
-            system=SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": msg}]
-        )
-
-        formatted_entry = response.content[0].text
+        market_text = format_market_for_prompt(market_data) if include_market else ""
 
         # Build full entry
-        market_data = get_market_data()
         sentiment = market_data.get('sentiment', {}) if market_data else {}
 
         full_entry = {
             'timestamp': timestamp,
             'sentiment': sentiment,
-            'content': formatted_entry,
+            'content': '',
             'raw_text': raw_text
         }
 
+        # Same text just formatted (or being formatted) - reuse that result
+        cache_key = entry_cache_key(session.get('username'), raw_text, market_text, sentiment)
+        content, future, owner = lookup_entry(cache_key)
+        streamed = wants_event_stream()
+        chunks = None
+
+        if owner:
+            # Every way out of this block publishes a result, so the in-flight
+            # slot is never left for duplicates to wait on
+            try:
+                client = get_anthropic_client(api_key)
+                if streamed:
+                    claude_request = build_claude_request(build_entry_message(market_text, timestamp, raw_text))
+                    chunks = start_entry_stream(cache_key, future, client, claude_request)
+                else:
+                    # Plain JSON clients: bursts are coalesced into one Claude request
+                    content = format_entry_batched(session.get('username'), client, market_text, timestamp, raw_text)
+                    finish_entry(cache_key, future, content)
+            except Exception as e:
+                if not future.done():
+                    finish_entry(cache_key, future, error=e)
+                raise
+        elif content is None:
+            try:
+                content = future.result(timeout=ENTRY_BATCH_TIMEOUT)
+            except FutureTimeoutError:
+                return jsonify({'error': 'Timed out waiting for the same entry to finish - please try again'}), 504
+
+        if streamed:
+            # Forward text to the browser as Claude generates it
+            def generate():
+                yield sse_event({'meta': {k: v for k, v in full_entry.items() if k != 'content'}})
+                if chunks is None:
+                    yield sse_event({'chunk': content})
+                    yield sse_event({'done': True})
+                    return
+
+                while (item := chunks.get()) is not None:
+                    if isinstance(item, anthropic.APITimeoutError):
+                        yield sse_event({'error': f'Claude stopped responding for {CLAUDE_STALL_TIMEOUT}s - please try again'})
+                        return
+                    if isinstance(item, Exception):
+                        yield sse_event({'error': str(item)})
+                        return
+                    yield sse_event({'chunk': item})
+                yield sse_event({'done': True})
+
+            return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        full_entry['content'] = content
+
         return jsonify(full_entry)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Shared HTTP session for image downloads - keeps connections to
+# res.cloudinary.com alive across saves, not just within one
+_image_http = requests.Session()
+_image_http.mount('https://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+# '[Image 1]: https://res.cloudinary.com/...' lines written by the editor
+_CLOUDINARY_RE = re.compile(r'\[Image[^\]]*\]:\s*(https?://\S*cloudinary\.com\S*)')
+
+def image_line_url(line_stripped):
+    """Cloudinary URL from an '[Image 1]: https://...' content line, or None"""
+    m = _CLOUDINARY_RE.match(line_stripped)
+    return m.group(1) if m else None
+
+def prefetch_images(entries):
+    """Download every embedded image in parallel -> {url: bytes, or None on failure}"""
+    urls = {url for entry in entries
+            for line in entry.get('content', '').splitlines()
+            if (url := image_line_url(line.strip()))}
+    if not urls:
+        return {}
+
+    def fetch(url):
+        try:
+            img_response = _image_http.get(url, timeout=10)
+            return img_response.content if img_response.status_code == 200 else None
+        except Exception as img_error:
+            log.warning("Failed to download image %s: %s", url, img_error)
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(8, len(urls))) as executor:
+        return dict(zip(urls, executor.map(fetch, urls)))
+
+# Word saves run in the background - downloading images and rewriting the
+# .docx can take seconds. One worker, since every save rewrites the whole file.
+SAVE_JOB_TTL = 600  # seconds before an unpolled save is forgotten
+_save_executor = ThreadPoolExecutor(max_workers=1)
+_pending_saves = {}  # job_id -> (username, submitted_at, future)
+_saves_lock = threading.Lock()
+
+def _prune_pending_saves():
+    cutoff = time.monotonic() - SAVE_JOB_TTL
+    with _saves_lock:
+        for job_id in [k for k, v in _pending_saves.items() if v[1] < cutoff]:
+            del _pending_saves[job_id]
+
+def save_docx_entries(entries):
+    """Append entries to the Word journal, embedding their images"""
+    # Open or create document
+    if os.path.exists(JOURNAL_PATH):
+        doc = Document(JOURNAL_PATH)
+    else:
+        doc = Document()
+        h = doc.add_heading("Trading Journal", 0)
+        h.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Download all embedded images concurrently before building the document
+    images = prefetch_images(entries)
+
+    # Loop-invariant values - Pt() builds a new Length object on every call
+    separator = _SEP_CHAR * 60
+    body_font_name, body_font_size = 'Calibri', Pt(11)
+    # doc.paragraphs rebuilds the whole list, so only check it once
+    needs_break = len(doc.paragraphs) > 1
+
+    def add_text(line):
+        p = doc.add_paragraph(line)
+        font = p.style.font
+        font.name = body_font_name
+        font.size = body_font_size
+
+    # Add entries
+    for entry in entries:
+        timestamp = entry.get('timestamp', '')
+        sentiment = entry.get('sentiment') or {}
+        content = entry.get('content', '')
+
+        if needs_break:
+            doc.add_page_break()
+        needs_break = True
+
+        # Header
+        p = doc.add_paragraph(separator)
+        p.style.font.name = 'Consolas'
+
+        p = doc.add_paragraph(_ENTRY_HEADER)
+        p.style.font.bold = True
+        p.style.font.size = Pt(14)
+
+        p = doc.add_paragraph(timestamp)
+
+        if sentiment:
+            label = sentiment.get('label', '')
+            p = doc.add_paragraph(f"Market Sentiment: {sentiment.get('icon', '')} {label}")
+            p.style.font.bold = True
+            if 'BULLISH' in label:
+                p.runs[0].font.color.rgb = RGBColor(0, 128, 0)
+            elif 'BEARISH' in label:
+                p.runs[0].font.color.rgb = RGBColor(200, 0, 0)
+
+        p = doc.add_paragraph(separator)
+        p.style.font.name = 'Consolas'
+
+        # Content - process line by line, embedding images
+        for line in content.splitlines():
+            line_stripped = line.strip()
+            if not line_stripped:
+                continue
+
+            # Check if this line contains an image URL from Cloudinary
+            url = image_line_url(line_stripped)
+            if url:
+                try:
+                    # Downloaded up front by prefetch_images
+                    img_bytes = images.get(url)
+                    if img_bytes:
+                        # Add image to document
+                        img_stream = io.BytesIO(img_bytes)
+                        doc.add_paragraph()  # Add spacing
+                        p = doc.add_paragraph()
+                        run = p.add_run()
+                        run.add_picture(img_stream, width=Inches(5))
+                        doc.add_paragraph()  # Add spacing after
+                    else:
+                        # If download fails, just add the URL as text
+                        add_text(line)
+                except Exception as img_error:
+                    log.warning("Failed to embed image %s: %s", url, img_error)
+                    add_text(line)
+            else:
+                add_text(line)
+
+    # A .docx is a zip archive and can't be appended to, so the file is
+    # rewritten once per save - after all posted entries are added
+    doc.save(JOURNAL_PATH)
+    invalidate_docx_journal()
+
+    return len(entries)
+
 @app.route('/api/save-journal', methods=['POST'])
 @login_required
 def api_save_journal():
@@ -573,8 +1542,9 @@ def api_save_journal():
         if not entries:
             return jsonify({'error': 'No entries to save'}), 400
 
-        # Cloud mode: save to JSON
+        # Cloud mode: save to SQLite
         if IS_CLOUD:
+            cloud_entries = []
             for entry in entries:
                 # Ensure entry has required fields
                 cloud_entry = {
@@ -583,8 +1553,14 @@ def api_save_journal():
                     'content': entry.get('content', ''),
                     'saved_at': datetime.now(timezone.utc).isoformat()
                 }
-                if not add_cloud_entry(cloud_entry):
-                    return jsonify({'error': 'Failed to save entry'}), 500
+                # Keep the original notes so the entry can be regenerated later
+                if entry.get('raw_text'):
+                    cloud_entry['raw_text'] = entry['raw_text']
+                cloud_entries.append(cloud_entry)
+
+            # All-or-nothing: one transaction however many entries were posted
+            if not add_cloud_entries(cloud_entries):
+                return jsonify({'error': 'Failed to save entry'}), 500
 
             return jsonify({'success': True, 'count': len(entries), 'mode': 'cloud'})
 
@@ -592,104 +1568,60 @@ def api_save_journal():
         if Document is None:
             return jsonify({'error': 'python-docx not installed'}), 500
 
-        # Open or create document
-        if os.path.exists(JOURNAL_PATH):
-            doc = Document(JOURNAL_PATH)
-        else:
-            doc = Document()
-            h = doc.add_heading("Trading Journal", 0)
-            h.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        _prune_pending_saves()
+        job_id = uuid.uuid4().hex
+        future = _save_executor.submit(save_docx_entries, entries)
+        with _saves_lock:
+            _pending_saves[job_id] = (get_current_user(), time.monotonic(), future)
 
-        # Add entries
-        for entry in entries:
-            if len(doc.paragraphs) > 1:
-                doc.add_page_break()
+        return jsonify({'success': True, 'status': 'pending', 'job_id': job_id}), 202
 
-            # Header
-            p = doc.add_paragraph("═" * 60)
-            p.style.font.name = 'Consolas'
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            p = doc.add_paragraph("TRADING JOURNAL ENTRY")
-            p.style.font.bold = True
-            p.style.font.size = Pt(14)
-
-            p = doc.add_paragraph(entry.get('timestamp', ''))
-
-            sentiment = entry.get('sentiment', {})
-            if sentiment:
-                p = doc.add_paragraph(f"Market Sentiment: {sentiment.get('icon', '')} {sentiment.get('label', '')}")
-                p.style.font.bold = True
-                if 'BULLISH' in sentiment.get('label', ''):
-                    p.runs[0].font.color.rgb = RGBColor(0, 128, 0)
-                elif 'BEARISH' in sentiment.get('label', ''):
-                    p.runs[0].font.color.rgb = RGBColor(200, 0, 0)
-
-            p = doc.add_paragraph("═" * 60)
-            p.style.font.name = 'Consolas'
-
-            # Content - process line by line, embedding images
-            content = entry.get('content', '')
-            for line in content.split('\n'):
-                line_stripped = line.strip()
-                if not line_stripped:
-                    continue
-
-                # Check if this line contains an image URL from Cloudinary
-                if line_stripped.startswith('[Image') and 'cloudinary.com' in line_stripped:
-                    # Extract URL from format: [Image 1]: https://...
-                    try:
-                        url = line_stripped.split(']: ', 1)[1].strip()
-                        # Download the image
-                        img_response = requests.get(url, timeout=10)
-                        if img_response.status_code == 200:
-                            # Add image to document
-                            img_stream = io.BytesIO(img_response.content)
-                            doc.add_paragraph()  # Add spacing
-                            p = doc.add_paragraph()
-                            run = p.add_run()
-                            run.add_picture(img_stream, width=Inches(5))
-                            doc.add_paragraph()  # Add spacing after
-                        else:
-                            # If download fails, just add the URL as text
-                            p = doc.add_paragraph(line)
-                            p.style.font.name = 'Calibri'
-                            p.style.font.size = Pt(11)
-                    except Exception as img_error:
-                        print(f"Failed to embed image: {img_error}")
-                        p = doc.add_paragraph(line)
-                        p.style.font.name = 'Calibri'
-                        p.style.font.size = Pt(11)
-                else:
-                    p = doc.add_paragraph(line)
-                    p.style.font.name = 'Calibri'
-                    p.style.font.size = Pt(11)
+@app.route('/api/save-journal/<job_id>')
+@login_required
+def api_save_status(job_id):
+    """Poll a queued Word journal save"""
+    with _saves_lock:
+        job = _pending_saves.get(job_id)
+    if not job or job[0] != get_current_user():
+        return jsonify({'error': 'Save not found'}), 404
 
-        doc.save(JOURNAL_PATH)
+    future = job[2]
+    if not future.done():
+        return jsonify({'status': 'pending'})
 
-        return jsonify({'success': True, 'count': len(entries), 'path': JOURNAL_PATH})
+    with _saves_lock:
+        _pending_saves.pop(job_id, None)
 
+    try:
+        count = future.result()
     except PermissionError:
         return jsonify({'error': 'File is open in another program'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    return jsonify({'success': True, 'status': 'done', 'count': count, 'path': JOURNAL_PATH})
+
 @app.route('/api/settings', methods=['GET', 'POST'])
 @login_required
 def api_settings():
     if request.method == 'GET':
         config = load_config()
-
-        # Check if API key came from environment variable
-        api_key_from_env = bool(os.environ.get('ANTHROPIC_API_KEY'))
+        api_key = config.get('api_key') or ''
+        cloud_name = config.get('cloudinary_cloud_name') or ''
+        environ = os.environ
 
         return jsonify({
-            'has_key': bool(config.get('api_key')),
-            'key_preview': config.get('api_key', '')[:10] + '...' if config.get('api_key') else '',
-            'key_from_env': api_key_from_env,
+            'has_key': bool(api_key),
+            'key_preview': api_key[:10] + '...' if api_key else '',
+            # Check if API key came from environment variable
+            'key_from_env': bool(environ.get('ANTHROPIC_API_KEY')),
             'is_cloud': IS_CLOUD,
-            'has_cloudinary': bool(config.get('cloudinary_cloud_name') and config.get('cloudinary_api_key') and config.get('cloudinary_api_secret')),
-            'cloudinary_cloud_name': config.get('cloudinary_cloud_name', ''),
-            'cloudinary_from_env': bool(os.environ.get('CLOUDINARY_CLOUD_NAME'))
+            'has_cloudinary': bool(cloud_name and config.get('cloudinary_api_key') and config.get('cloudinary_api_secret')),
+            'cloudinary_cloud_name': cloud_name,
+            'cloudinary_from_env': bool(environ.get('CLOUDINARY_CLOUD_NAME'))
         })
     else:
         data = request.json
@@ -708,10 +1640,23 @@ def api_settings():
             return jsonify({'success': True})
         return jsonify({'error': 'Could not save settings'}), 500
 
+# Background Cloudinary uploads - the HTTPS upload can take seconds, so the
+# request returns an upload id right away and the browser polls for the result
+UPLOAD_JOB_TTL = 600  # seconds before an unpolled upload is forgotten
+_upload_executor = ThreadPoolExecutor(max_workers=4)
+_pending_uploads = {}  # upload_id -> (username, submitted_at, future)
+_uploads_lock = threading.Lock()
+
+def _prune_pending_uploads():
+    cutoff = time.monotonic() - UPLOAD_JOB_TTL
+    with _uploads_lock:
+        for upload_id in [k for k, v in _pending_uploads.items() if v[1] < cutoff]:
+            del _pending_uploads[upload_id]
+
 @app.route('/api/upload-image', methods=['POST'])
 @login_required
 def api_upload_image():
-    """Upload an image to Cloudinary"""
+    """Queue an image upload to Cloudinary"""
     try:
         if cloudinary is None:
             return jsonify({'error': 'Cloudinary not installed'}), 500
@@ -730,33 +1675,69 @@ def api_upload_image():
             # Extract base64 part
             image_data = image_data.split(',')[1]
 
+        # Decode once and upload the raw bytes - re-wrapping the base64 in a
+        # data URL would only be decoded again by the Cloudinary SDK
+        try:
+            image_bytes = base64.b64decode(image_data, validate=True)
+        except ValueError:
+            return jsonify({'error': 'Invalid image data'}), 400
+
         # Generate unique filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         public_id = f"trading_journal/{timestamp}"
 
-        # Upload to Cloudinary
-        result = cloudinary.uploader.upload(
-            f"data:image/png;base64,{image_data}",
+        # Upload to Cloudinary in the background
+        _prune_pending_uploads()
+        upload_id = uuid.uuid4().hex
+        future = _upload_executor.submit(
+            cloudinary.uploader.upload,
+            io.BytesIO(image_bytes),
             public_id=public_id,
             folder="trading_journal"
         )
+        with _uploads_lock:
+            _pending_uploads[upload_id] = (get_current_user(), time.monotonic(), future)
 
-        return jsonify({
-            'success': True,
-            'url': result['secure_url'],
-            'public_id': result['public_id'],
-            'width': result.get('width'),
-            'height': result.get('height')
-        })
+        return jsonify({'success': True, 'status': 'pending', 'upload_id': upload_id}), 202
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/upload-status/<upload_id>')
+@login_required
+def api_upload_status(upload_id):
+    """Poll a queued Cloudinary upload"""
+    with _uploads_lock:
+        job = _pending_uploads.get(upload_id)
+    if not job or job[0] != get_current_user():
+        return jsonify({'error': 'Upload not found'}), 404
+
+    future = job[2]
+    if not future.done():
+        return jsonify({'status': 'pending'})
+
+    with _uploads_lock:
+        _pending_uploads.pop(upload_id, None)
+
+    try:
+        result = future.result()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'status': 'done',
+        'url': result['secure_url'],
+        'public_id': result['public_id'],
+        'width': result.get('width'),
+        'height': result.get('height')
+    })
+
 @app.route('/api/view-journal')
 @login_required
 def api_view_journal():
     try:
-        # Cloud mode: read from JSON
+        # Cloud mode: read from SQLite
         if IS_CLOUD:
             journal = load_cloud_journal()
             if not journal['entries']:
@@ -784,15 +1765,7 @@ def api_view_journal():
         if Document is None:
             return jsonify({'error': 'python-docx not installed'}), 500
 
-        doc = Document(JOURNAL_PATH)
-        content = []
-
-        for para in doc.paragraphs:
-            text = para.text.strip()
-            if text:
-                content.append(text)
-
-        return jsonify({'content': '\n'.join(content)})
+        return jsonify({'content': load_docx_journal(JOURNAL_PATH)['content']})
 
     except PermissionError:
         return jsonify({'error': 'Journal file is open in another program'}), 500
@@ -804,14 +1777,15 @@ def api_view_journal():
 def api_list_entries():
     """List the last 10 journal entries with previews"""
     try:
-        # Cloud mode: read from JSON
+        # Cloud mode: read from SQLite
         if IS_CLOUD:
-            journal = load_cloud_journal()
-            if not journal['entries']:
+            recent = recent_cloud_entries(10)
+            if not recent:
                 return jsonify({'entries': [], 'message': 'No journal entries found'})
 
+            # Last 10 entries, most recent first
             entries = []
-            for entry in journal['entries']:
+            for entry in recent:
                 preview = entry.get('content', '')[:100] + '...' if entry.get('content') else ''
                 entries.append({
                     'timestamp': entry.get('timestamp', ''),
@@ -820,9 +1794,7 @@ def api_list_entries():
                     'content': entry.get('content', '')
                 })
 
-            # Return last 10 entries, most recent first
-            entries.reverse()
-            return jsonify({'entries': entries[:10]})
+            return jsonify({'entries': entries})
 
         # Local mode: read from Word document
         if not os.path.exists(JOURNAL_PATH):
@@ -831,64 +1803,7 @@ def api_list_entries():
         if Document is None:
             return jsonify({'error': 'python-docx not installed'}), 500
 
-        doc = Document(JOURNAL_PATH)
-
-        # Parse entries - each entry starts with the separator line
-        entries = []
-        current_entry = []
-        entry_timestamp = None
-        entry_sentiment = None
-
-        for para in doc.paragraphs:
-            text = para.text.strip()
-
-            # Detect entry separator
-            if text.startswith('═' * 20) or text == 'TRADING JOURNAL ENTRY':
-                if current_entry and entry_timestamp:
-                    # Save previous entry
-                    content = '\n'.join(current_entry)
-                    # Get preview (first 100 chars of actual content)
-                    preview_lines = [l for l in current_entry if l and not l.startswith('═') and l != 'TRADING JOURNAL ENTRY' and 'Market Sentiment' not in l]
-                    preview = ' '.join(preview_lines)[:100] + '...' if preview_lines else ''
-
-                    entries.append({
-                        'timestamp': entry_timestamp,
-                        'sentiment': entry_sentiment,
-                        'preview': preview,
-                        'content': content
-                    })
-
-                if text == 'TRADING JOURNAL ENTRY':
-                    current_entry = [text]
-                    entry_timestamp = None
-                    entry_sentiment = None
-                else:
-                    current_entry = [text]
-            elif current_entry is not None:
-                current_entry.append(text)
-
-                # Try to extract timestamp (usually line after TRADING JOURNAL ENTRY)
-                if entry_timestamp is None and text and not text.startswith('═') and 'Market Sentiment' not in text:
-                    # Check if it looks like a date
-                    if any(day in text for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']):
-                        entry_timestamp = text
-
-                # Extract sentiment
-                if 'Market Sentiment:' in text:
-                    entry_sentiment = text.replace('Market Sentiment:', '').strip()
-
-        # Don't forget the last entry
-        if current_entry and entry_timestamp:
-            content = '\n'.join(current_entry)
-            preview_lines = [l for l in current_entry if l and not l.startswith('═') and l != 'TRADING JOURNAL ENTRY' and 'Market Sentiment' not in l]
-            preview = ' '.join(preview_lines)[:100] + '...' if preview_lines else ''
-
-            entries.append({
-                'timestamp': entry_timestamp,
-                'sentiment': entry_sentiment,
-                'preview': preview,
-                'content': content
-            })
+        entries = list(load_docx_journal(JOURNAL_PATH)['entries'])
 
         # Return last 10 entries, most recent first
         entries.reverse()
@@ -911,16 +1826,9 @@ def api_delete_entry():
             return jsonify({'error': 'Missing entry index'}), 400
 
         if IS_CLOUD:
-            journal = load_cloud_journal()
-            entries = journal.get('entries', [])
-
-            # Convert to positive index if negative
-            if entry_index < 0:
-                entry_index = len(entries) + entry_index
-
-            if 0 <= entry_index < len(entries):
-                deleted = entries.pop(entry_index)
-                save_cloud_journal(journal)
+            # Negative indexes count from the most recent entry
+            deleted = delete_cloud_entry(entry_index)
+            if deleted is not None:
                 return jsonify({'success': True, 'deleted': deleted.get('timestamp', 'Unknown')})
             else:
                 return jsonify({'error': 'Entry not found'}), 404
@@ -945,21 +1853,18 @@ def api_update_entry():
             return jsonify({'error': 'Missing content'}), 400
 
         if IS_CLOUD:
-            journal = load_cloud_journal()
-            entries = journal.get('entries', [])
+            # Update preview
+            preview_text = new_content[:150].replace('\n', ' ')
+            if len(new_content) > 150:
+                preview_text += '...'
 
-            if 0 <= entry_index < len(entries):
-                # Update the entry content
-                entries[entry_index]['content'] = new_content
+            changes = {
+                'content': new_content,
                 # Update timestamp to show it was edited
-                entries[entry_index]['edited'] = datetime.now().strftime('%Y-%m-%d %H:%M')
-                # Update preview
-                preview_text = new_content[:150].replace('\n', ' ')
-                if len(new_content) > 150:
-                    preview_text += '...'
-                entries[entry_index]['preview'] = preview_text
-
-                save_cloud_journal(journal)
+                'edited': datetime.now().strftime('%Y-%m-%d %H:%M'),
+                'preview': preview_text
+            }
+            if entry_index >= 0 and update_cloud_entry(entry_index, changes):
                 return jsonify({'success': True, 'message': 'Entry updated'})
             else:
                 return jsonify({'error': 'Entry not found'}), 404
@@ -969,6 +1874,118 @@ def api_update_entry():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Message Batches API - regenerating many entries is not interactive, so it
+# goes through the half-price batch endpoint instead of one call per entry
+BATCH_MAX_ENTRIES = 100
+# Same block the editor appends below an entry's text (templates/index.html)
+ATTACHED_IMAGES_HEADER = '── Attached Images ' + '─' * 41
+
+def regenerated_content(old_content, new_content):
+    """Claude's new text plus the [Image N] lines carried over from the old entry"""
+    image_lines = [l.strip() for l in old_content.splitlines() if l.strip().startswith('[Image')]
+    if not image_lines:
+        return new_content
+    return new_content.rstrip() + '\n\n' + ATTACHED_IMAGES_HEADER + '\n' + '\n'.join(image_lines) + '\n'
+
+@app.route('/api/batch-regenerate', methods=['POST'])
+@login_required
+def api_batch_regenerate():
+    """Submit entries (default: all with saved raw notes) for batch regeneration"""
+    try:
+        if not IS_CLOUD:
+            return jsonify({'error': 'Batch regeneration not supported in local mode'}), 400
+
+        api_key = get_api_key()
+        if not api_key:
+            return jsonify({'error': 'API key not configured'}), 400
+
+        data = request.json or {}
+        rows = cloud_entry_rows()
+
+        indexes = data.get('indexes')
+        if indexes is None:
+            indexes = range(len(rows))
+        pending = [rows[i] for i in indexes
+                   if 0 <= i < len(rows) and rows[i][1].get('raw_text') and not rows[i][1].get('batch_id')]
+        pending = pending[:BATCH_MAX_ENTRIES]
+
+        if not pending:
+            return jsonify({'error': 'No entries to regenerate'}), 400
+
+        # Results are matched back by row id, not list position
+        batch_requests = []
+        for row_id, entry in pending:
+            msg = f"Date/Time: {entry.get('timestamp', '')}\n\nMy trading thoughts:\n{entry['raw_text']}"
+            batch_requests.append({'custom_id': f"entry-{row_id}", 'params': build_claude_request(msg)})
+
+        client = get_anthropic_client(api_key)
+        acquire_claude_slot()
+        batch = client.messages.batches.create(requests=batch_requests)
+
+        # Remember which batch each entry belongs to so results can be written back
+        update_cloud_entries([row_id for row_id, _ in pending],
+                             lambda row_id, entry: dict(entry, batch_id=batch.id, batch_custom_id=f"entry-{row_id}"))
+
+        return jsonify({'success': True, 'batch_id': batch.id, 'count': len(pending)}), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/batch-regenerate/<batch_id>')
+@login_required
+def api_batch_status(batch_id):
+    """Poll a regeneration batch, writing results into the journal once it has ended"""
+    try:
+        if not IS_CLOUD:
+            return jsonify({'error': 'Batch regeneration not supported in local mode'}), 400
+
+        # Only batches submitted for this user's own entries
+        batch_rows = [row_id for row_id, entry in cloud_entry_rows() if entry.get('batch_id') == batch_id]
+        if not batch_rows:
+            return jsonify({'error': 'Batch not found'}), 404
+
+        api_key = get_api_key()
+        if not api_key:
+            return jsonify({'error': 'API key not configured'}), 400
+
+        client = get_anthropic_client(api_key)
+        batch = client.messages.batches.retrieve(batch_id)
+        if batch.processing_status != 'ended':
+            return jsonify({'status': batch.processing_status,
+                            'processing': batch.request_counts.processing})
+
+        results = {}
+        for result in client.messages.batches.results(batch_id):
+            if result.result.type == 'succeeded':
+                results[result.custom_id] = result.result.message.content[0].text
+            else:
+                results[result.custom_id] = None
+
+        counts = {'updated': 0, 'failed': 0}
+
+        def apply_result(row_id, entry):
+            if entry.get('batch_id') != batch_id:
+                return entry
+            content = results.get(entry.get('batch_custom_id'))
+            entry = {k: v for k, v in entry.items() if k not in ('batch_id', 'batch_custom_id')}
+            if content:
+                # Keep the text being replaced - it may carry the user's own edits
+                old_content = entry.get('content', '')
+                entry['previous_content'] = old_content
+                entry['content'] = regenerated_content(old_content, content)
+                entry['regenerated'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+                counts['updated'] += 1
+            else:
+                counts['failed'] += 1
+            return entry
+
+        update_cloud_entries(batch_rows, apply_result)
+
+        return jsonify({'success': True, 'status': 'ended', **counts})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/clear-journal', methods=['POST'])
 @login_required
 def api_clear_journal():
@@ -988,14 +2005,17 @@ def api_clear_journal():
 # ============================================================================
 
 if __name__ == '__main__':
+    # Local development server - production runs under gunicorn (see Procfile
+    # and gunicorn.conf.py)
     # Get port from environment (for cloud platforms) or default to 5000
     port = int(os.environ.get('PORT', 5000))
     debug = not IS_CLOUD  # Disable debug mode in production
 
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
     print("Starting Trading Journal Web App...")
     if IS_CLOUD:
         print(f"Running in CLOUD mode on port {port}")
     else:
         print(f"Open http://localhost:{port} in your browser")
 
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
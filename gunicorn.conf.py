@@ -0,0 +1,25 @@
+# ============================================================================
+# Gunicorn settings (loaded automatically by `gunicorn app:app`)
+# ============================================================================
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Threaded workers: the slow paths (Claude, Yahoo Finance, Cloudinary) are
+# network-bound, so one worker serves many requests while others wait on I/O
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Upload/save job status and the caches live in each worker's memory, so status
+# polls must reach the worker that started the job. Keep one worker unless the
+# platform provides sticky routing; raise WEB_CONCURRENCY (up to 2*CPU+1) then.
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+max_workers = multiprocessing.cpu_count() * 2 + 1
+workers = max(1, min(workers, max_workers))
+
+# Long Claude generations stream for minutes
+timeout = 600
+graceful_timeout = 30
+keepalive = 5